@@ -36,7 +36,7 @@ class A2C_ACKTR():
         num_steps, num_processes, _ = rollouts.rewards.size()
 
         values, action_log_probs, dist_entropy, _ = self.actor_critic.evaluate_actions(
-            rollouts.obs[:-1].view(-1, *obs_shape),
+            rollouts.obs[:-1].view(-1, *obs_shape).float(),
             rollouts.recurrent_hidden_states[0].view(-1, self.actor_critic.recurrent_hidden_state_size),
             rollouts.masks[:-1].view(-1, 1),
             rollouts.actions.view(-1, action_shape))
@@ -32,7 +32,7 @@ class PPO():
         self.optimizer = optim.Adam(actor_critic.parameters(), lr=lr, eps=eps)
 
     def update(self, rollouts):
-        advantages = rollouts.returns[:-1] - rollouts.value_preds[:-1]
+        advantages = rollouts.advantages
         advantages = (advantages - advantages.mean()) / (
             advantages.std() + 1e-5)
 
@@ -66,6 +66,13 @@ def get_args():
                         help='use a linear schedule on the learning rate')
     parser.add_argument('--use-linear-clip-decay', action='store_true', default=False,
                         help='use a linear schedule on the ppo clipping parameter')
+    parser.add_argument('--storage-layout', default='separate', choices=['separate', 'soa_fused'],
+                        help='rollout storage layout, soa_fused keeps all fields in one tensor for single-gather minibatches (default: separate)')
+    parser.add_argument('--storage-dtype', default='float32', choices=['float32', 'bfloat16', 'float16'],
+                        help='precision of the stored observations with the separate storage layout, '
+                             'everything else and the losses stay float32 (default: float32)')
+    parser.add_argument('--compile-policy', action='store_true', default=False,
+                        help='compile the policy sampling path with torch.compile (requires PyTorch 2.0+)')
     parser.add_argument('--vis', action='store_true', default=False,
                         help='enable visdom visualization')
     parser.add_argument('--port', type=int, default=8097,
@@ -139,16 +139,33 @@ class VecPyTorch(VecEnvWrapper):
     def __init__(self, venv, device, return_orig_obs=False):
         """Return only every `skip`-th frame"""
         super(VecPyTorch, self).__init__(venv)
-        self.device = device
+        self.device = torch.device(device)
         self.return_orig_obs = return_orig_obs
+        self.pinned_actions = None
         # TODO: Fix data types
 
+    def _obs_to_device(self, obs):
+        obs = torch.from_numpy(obs)
+        if self.device.type == 'cuda':
+            # Convert into pinned host memory so the copy to the GPU can run asynchronously
+            pinned_obs = torch.empty(obs.shape, dtype=torch.float32, pin_memory=True)
+            return pinned_obs.copy_(obs).to(self.device, non_blocking=True)
+        return obs.float().to(self.device)
+
     def reset(self):
         obs = self.venv.reset()
-        obs = torch.from_numpy(obs).float().to(self.device)
+        obs = self._obs_to_device(obs)
         return obs
 
     def step_async(self, actions):
+        if actions.is_cuda:
+            # Copy GPU actions into a reused pinned host buffer rather than pageable memory
+            if self.pinned_actions is None or self.pinned_actions.shape != actions.shape \
+                    or self.pinned_actions.dtype != actions.dtype:
+                self.pinned_actions = torch.empty(actions.shape, dtype=actions.dtype, pin_memory=True)
+            self.pinned_actions.copy_(actions, non_blocking=True)
+            torch.cuda.current_stream(actions.device).synchronize()
+            actions = self.pinned_actions
         actions = actions.squeeze(1).cpu().numpy()
         self.venv.step_async(actions)
 
@@ -157,7 +174,7 @@ class VecPyTorch(VecEnvWrapper):
             obs_orig, obs, reward, done, info = self.venv.step_wait()
         else:
             obs, reward, done, info = self.venv.step_wait()
-        obs = torch.from_numpy(obs).float().to(self.device)
+        obs = self._obs_to_device(obs)
         reward = torch.from_numpy(reward).unsqueeze(dim=1).float()
         if self.return_orig_obs:
             return obs_orig, obs, reward, done, info
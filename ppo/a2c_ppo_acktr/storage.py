@@ -6,34 +6,96 @@ def _flatten_helper(T, N, _tensor):
     return _tensor.view(T * N, *_tensor.size()[2:])
 
 
+# The return recurrences run backwards over time, so they are scripted to keep the
+# per-step loop out of the Python interpreter
+@torch.jit.script
+def _compute_gae_returns(rewards, value_preds, masks, returns, gamma: float, tau: float):
+    gae = torch.zeros_like(rewards[0])
+    for step in range(rewards.size(0) - 1, -1, -1):
+        delta = rewards[step] + gamma * value_preds[step + 1] * masks[step + 1] - value_preds[step]
+        gae = delta + gamma * tau * masks[step + 1] * gae
+        returns[step] = gae + value_preds[step]
+
+
+@torch.jit.script
+def _compute_discounted_returns(rewards, masks, returns, gamma: float):
+    for step in range(rewards.size(0) - 1, -1, -1):
+        returns[step] = returns[step + 1] * gamma * masks[step + 1] + rewards[step]
+
+
+# Fields stored in the 'soa_fused' arena (in feature axis order) and whether they
+# only have num_steps entries rather than num_steps + 1
+_FUSED_FIELDS = [('obs', False), ('recurrent_hidden_states', False), ('actions', True),
+                 ('action_log_probs', True), ('value_preds', False), ('returns', False),
+                 ('advantages', True), ('rewards', True), ('masks', False)]
+
+
 class RolloutStorage(object):
-    def __init__(self, num_steps, num_processes, obs_shape, action_space, recurrent_hidden_state_size):
-        self.obs = torch.zeros(num_steps + 1, num_processes, *obs_shape)
-        self.recurrent_hidden_states = torch.zeros(num_steps + 1, num_processes, recurrent_hidden_state_size)
-        self.rewards = torch.zeros(num_steps, num_processes, 1)
-        self.value_preds = torch.zeros(num_steps + 1, num_processes, 1)
-        self.returns = torch.zeros(num_steps + 1, num_processes, 1)
-        self.action_log_probs = torch.zeros(num_steps, num_processes, 1)
+    def __init__(self, num_steps, num_processes, obs_shape, action_space, recurrent_hidden_state_size,
+                 storage_layout='separate', dtype=torch.float32):
         if action_space.__class__.__name__ == 'Discrete':
             action_shape = 1
         else:
             action_shape = action_space.shape[0]
-        self.actions = torch.zeros(num_steps, num_processes, action_shape)
-        if action_space.__class__.__name__ == 'Discrete':
-            self.actions = self.actions.long()
-        self.masks = torch.ones(num_steps + 1, num_processes, 1)
+
+        self.storage_layout = storage_layout
+        if storage_layout == 'soa_fused':
+            # All fields live side by side in one (num_steps + 1, num_processes, features) arena, so a
+            # minibatch is a single gather of contiguous rows instead of one gather per field
+            assert len(obs_shape) == 1, 'soa_fused storage only supports flat observations'
+            assert action_space.__class__.__name__ != 'Discrete', 'soa_fused storage only supports float actions'
+            # A single tensor has a single dtype, and action_log_probs must stay float32 for the PPO ratio
+            assert dtype == torch.float32, 'soa_fused storage only supports float32'
+            field_sizes = {'obs': obs_shape[0], 'recurrent_hidden_states': recurrent_hidden_state_size,
+                           'actions': action_shape}
+            self._field_slices = {}
+            start = 0
+            for name, _ in _FUSED_FIELDS:
+                size = field_sizes.get(name, 1)
+                self._field_slices[name] = (start, start + size)
+                start += size
+            self._arena = torch.zeros(num_steps + 1, num_processes, start)
+            self._set_fused_views()
+            self.masks.fill_(1.0)
+        elif storage_layout == 'separate':
+            # dtype only applies to obs. Everything else stays float32: rounded actions or log-probs skew
+            # the PPO ratio, and rounded values or returns exceed the value clip and leak into GAE
+            self.obs = torch.zeros(num_steps + 1, num_processes, *obs_shape, dtype=dtype)
+            self.recurrent_hidden_states = torch.zeros(num_steps + 1, num_processes, recurrent_hidden_state_size)
+            self.rewards = torch.zeros(num_steps, num_processes, 1)
+            self.value_preds = torch.zeros(num_steps + 1, num_processes, 1)
+            self.returns = torch.zeros(num_steps + 1, num_processes, 1)
+            self.action_log_probs = torch.zeros(num_steps, num_processes, 1)
+            self.advantages = torch.zeros(num_steps, num_processes, 1)
+            self.actions = torch.zeros(num_steps, num_processes, action_shape)
+            if action_space.__class__.__name__ == 'Discrete':
+                self.actions = self.actions.long()
+            self.masks = torch.ones(num_steps + 1, num_processes, 1)
+        else:
+            raise NotImplementedError
 
         self.num_steps = num_steps
         self.step = 0
         self.iteration = 0
 
+    def _set_fused_views(self):
+        for name, per_step in _FUSED_FIELDS:
+            start, end = self._field_slices[name]
+            field = self._arena[..., start:end]
+            setattr(self, name, field[:-1] if per_step else field)
+
     def to(self, device):
+        if self.storage_layout == 'soa_fused':
+            self._arena = self._arena.to(device)
+            self._set_fused_views()
+            return
         self.obs = self.obs.to(device)
         self.recurrent_hidden_states = self.recurrent_hidden_states.to(device)
         self.rewards = self.rewards.to(device)
         self.value_preds = self.value_preds.to(device)
         self.returns = self.returns.to(device)
         self.action_log_probs = self.action_log_probs.to(device)
+        self.advantages = self.advantages.to(device)
         self.actions = self.actions.to(device)
         self.masks = self.masks.to(device)
 
@@ -77,16 +139,11 @@ class RolloutStorage(object):
     def compute_returns(self, next_value, use_gae, gamma, tau):
         if use_gae:
             self.value_preds[-1] = next_value
-            gae = 0
-            for step in reversed(range(self.rewards.size(0))):
-                delta = self.rewards[step] + gamma * self.value_preds[step + 1] * self.masks[step + 1] - self.value_preds[step]
-                gae = delta + gamma * tau * self.masks[step + 1] * gae
-                self.returns[step] = gae + self.value_preds[step]
+            _compute_gae_returns(self.rewards, self.value_preds, self.masks, self.returns, gamma, tau)
         else:
             self.returns[-1] = next_value
-            for step in reversed(range(self.rewards.size(0))):
-                self.returns[step] = self.returns[step + 1] * \
-                    gamma * self.masks[step + 1] + self.rewards[step]
+            _compute_discounted_returns(self.rewards, self.masks, self.returns, gamma)
+        self.advantages.copy_(self.returns[:-1] - self.value_preds[:-1])
 
 
     def feed_forward_generator(self, advantages, num_mini_batch):
@@ -99,6 +156,15 @@ class RolloutStorage(object):
             "".format(num_processes, num_steps, num_processes * num_steps, num_mini_batch))
         mini_batch_size = batch_size // num_mini_batch
         sampler = BatchSampler(SubsetRandomSampler(range(batch_size)), mini_batch_size, drop_last=False)
+        if self.storage_layout == 'soa_fused':
+            self.advantages.copy_(advantages)
+            arena = self._arena[:-1].view(batch_size, -1)
+            for indices in sampler:
+                batch = arena[indices]
+                yield tuple(batch[:, slice(*self._field_slices[name])] for name in
+                            ['obs', 'recurrent_hidden_states', 'actions', 'value_preds', 'returns', 'masks',
+                             'action_log_probs', 'advantages'])
+            return
         for indices in sampler:
             obs_batch = self.obs[:-1].view(-1, *self.obs.size()[2:])[indices]
             recurrent_hidden_states_batch = self.recurrent_hidden_states[:-1].view(-1,
@@ -110,7 +176,7 @@ class RolloutStorage(object):
             old_action_log_probs_batch = self.action_log_probs.view(-1, 1)[indices]
             adv_targ = advantages.view(-1, 1)[indices]
 
-            yield obs_batch, recurrent_hidden_states_batch, actions_batch, \
+            yield obs_batch.float(), recurrent_hidden_states_batch, actions_batch, \
                 value_preds_batch, return_batch, masks_batch, old_action_log_probs_batch, adv_targ
 
     def recurrent_generator(self, advantages, num_mini_batch):
@@ -165,5 +231,5 @@ class RolloutStorage(object):
                     old_action_log_probs_batch)
             adv_targ = _flatten_helper(T, N, adv_targ)
 
-            yield obs_batch, recurrent_hidden_states_batch, actions_batch, \
+            yield obs_batch.float(), recurrent_hidden_states_batch, actions_batch, \
                 value_preds_batch, return_batch, masks_batch, old_action_log_probs_batch, adv_targ
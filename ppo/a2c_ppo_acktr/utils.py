@@ -1,3 +1,5 @@
+import copy
+
 import torch
 import torch.nn as nn
 
@@ -16,6 +18,18 @@ def get_render_func(venv):
     return None
 
 
+# Reseed the envs of an in-process vec env, returns False if they live in subprocesses
+def seed_vec_env(venv, seed):
+    if hasattr(venv, 'envs'):
+        for rank, env in enumerate(venv.envs):
+            env.seed(seed + rank)
+        return True
+    elif hasattr(venv, 'venv'):
+        return seed_vec_env(venv.venv, seed)
+
+    return False
+
+
 def get_vec_normalize(venv):
     if isinstance(venv, VecNormalize):
         return venv
@@ -25,6 +39,25 @@ def get_vec_normalize(venv):
     return None
 
 
+def cpu_copy(module):
+    """Copies a module to the CPU without first cloning its tensors on the GPU"""
+    # Seed deepcopy's memo with CPU copies of every parameter and buffer, so the
+    # rest of the module structure is copied around them
+    memo = {}
+    for param in module.parameters():
+        memo[id(param)] = nn.Parameter(param.detach().to('cpu', copy=True), requires_grad=param.requires_grad)
+    for buf in module.buffers():
+        memo[id(buf)] = buf.detach().to('cpu', copy=True)
+    return copy.deepcopy(module, memo)
+
+
+def get_act_func(actor_critic, compile_policy=False, mode='default'):
+    """Returns the policy's act function, optionally compiled with torch.compile in the given mode"""
+    if compile_policy and hasattr(torch, 'compile'):
+        return torch.compile(actor_critic.act, mode=mode)
+    return actor_critic.act
+
+
 # Necessary for my KFAC implementation.
 class AddBias(nn.Module):
     def __init__(self, bias):
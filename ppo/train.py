@@ -1,4 +1,4 @@
-import os, sys, time, copy, glob
+import os, sys, time, glob
 from collections import deque
 
 import gym
@@ -11,10 +11,10 @@ import torch.optim as optim
 
 from ppo.a2c_ppo_acktr import algo
 from ppo.a2c_ppo_acktr.arguments import get_args
-from ppo.a2c_ppo_acktr.envs import make_vec_envs
+from ppo.a2c_ppo_acktr.envs import make_env, make_vec_envs
 from ppo.a2c_ppo_acktr.model import Policy
 from ppo.a2c_ppo_acktr.storage import RolloutStorage
-from ppo.a2c_ppo_acktr.utils import get_vec_normalize, update_linear_schedule
+from ppo.a2c_ppo_acktr.utils import cpu_copy, get_act_func, get_vec_normalize, seed_vec_env, update_linear_schedule_v2
 from ppo.a2c_ppo_acktr.visualize import visdom_plot
 
 
@@ -72,32 +72,30 @@ def main():
         viz = Visdom(port=args.port)
         win = None
 
-    envs = make_vec_envs(args.env_name, args.seed, 1,
-                        args.gamma, args.log_dir, args.add_timestep, device, False)
-
     # Determine if this is a dual robot (multi agent) environment.
-    obs = envs.reset()
-    action = torch.tensor([envs.action_space.sample()])
-    _, _, _, info = envs.step(action)
-    dual_robots = 'dual_robots' in info[0]
+    # A single in-process env is enough to read the info dict, no need to spin up a vec env for it.
+    probe_env = make_env(args.env_name, args.seed, 0, None, args.add_timestep, False)()
+    probe_env.reset()
+    _, _, _, info = probe_env.step(probe_env.action_space.sample())
+    probe_env.close()
+    dual_robots = 'dual_robots' in info
     if dual_robots:
-        obs_robot_len = info[0]['obs_robot_len'] // 2
-        action_robot_len = info[0]['action_robot_len'] // 2
-        obs_robot1 = obs[:, :obs_robot_len]
-        obs_robot2 = obs[:, obs_robot_len:]
-        if len(obs_robot1[0]) != obs_robot_len or len(obs_robot2[0]) != obs_robot_len:
-            print('robot 1 obs shape:', len(obs_robot1[0]), 'obs space robot shape:', (obs_robot_len,))
-            print('robot 2 obs shape:', len(obs_robot2[0]), 'obs space robot shape:', (obs_robot_len,))
-            exit()
+        obs_robot_len = info['obs_robot_len'] // 2
+        action_robot_len = info['action_robot_len'] // 2
 
     envs = make_vec_envs(args.env_name, args.seed, args.num_processes,
                         args.gamma, args.log_dir, args.add_timestep, device, False)
+    train_vec_norm = get_vec_normalize(envs)
 
     if dual_robots:
         # Reset environment
         obs = envs.reset()
         obs_robot1 = obs[:, :obs_robot_len]
         obs_robot2 = obs[:, obs_robot_len:]
+        if len(obs_robot1[0]) != obs_robot_len or len(obs_robot2[0]) != obs_robot_len:
+            print('robot 1 obs shape:', len(obs_robot1[0]), 'obs space robot shape:', (obs_robot_len,))
+            print('robot 2 obs shape:', len(obs_robot2[0]), 'obs space robot shape:', (obs_robot_len,))
+            exit()
         action_space_robot1 = spaces.Box(low=np.array([-1.0]*action_robot_len), high=np.array([1.0]*action_robot_len), dtype=np.float32)
         action_space_robot2 = spaces.Box(low=np.array([-1.0]*action_robot_len), high=np.array([1.0]*action_robot_len), dtype=np.float32)
 
@@ -106,9 +104,8 @@ def main():
             actor_critic_robot1, actor_critic_robot2, ob_rms = torch.load(args.load_policy)
         else:
             actor_critic, ob_rms = torch.load(args.load_policy)
-        vec_norm = get_vec_normalize(envs)
-        if vec_norm is not None:
-            vec_norm.ob_rms = ob_rms
+        if train_vec_norm is not None:
+            train_vec_norm.ob_rms = ob_rms
     else:
         if dual_robots:
             actor_critic_robot1 = Policy([obs_robot_len], action_space_robot1,
@@ -121,8 +118,13 @@ def main():
     if dual_robots:
         actor_critic_robot1.to(device)
         actor_critic_robot2.to(device)
+        # No CUDA graphs here: replaying robot 2's graph can overwrite robot 1's outputs before they are read
+        act_robot1 = get_act_func(actor_critic_robot1, args.compile_policy)
+        act_robot2 = get_act_func(actor_critic_robot2, args.compile_policy)
     else:
         actor_critic.to(device)
+        # Rollout batches have a fixed shape, so on GPU CUDA graphs can replay the whole forward pass
+        act = get_act_func(actor_critic, args.compile_policy, 'reduce-overhead' if args.cuda else 'default')
 
     if args.algo == 'a2c':
         agent = algo.A2C_ACKTR(actor_critic, args.value_loss_coef,
@@ -148,16 +150,20 @@ def main():
         agent = algo.A2C_ACKTR(actor_critic, args.value_loss_coef,
                                args.entropy_coef, acktr=True)
 
+    # Number of copies of the initial observations needed to fill every stored rollout
+    num_obs_tiles = args.num_rollouts // args.num_processes + 1
     if dual_robots:
         rollouts_robot1 = RolloutStorage(args.num_steps, args.num_rollouts if args.num_rollouts > 0 else args.num_processes,
                             [obs_robot_len], action_space_robot1,
-                            actor_critic_robot1.recurrent_hidden_state_size)
+                            actor_critic_robot1.recurrent_hidden_state_size,
+                            storage_layout=args.storage_layout, dtype=getattr(torch, args.storage_dtype))
         rollouts_robot2 = RolloutStorage(args.num_steps, args.num_rollouts if args.num_rollouts > 0 else args.num_processes,
                             [obs_robot_len], action_space_robot2,
-                            actor_critic_robot2.recurrent_hidden_state_size)
+                            actor_critic_robot2.recurrent_hidden_state_size,
+                            storage_layout=args.storage_layout, dtype=getattr(torch, args.storage_dtype))
         if args.num_rollouts > 0:
-            rollouts_robot1.obs[0].copy_(torch.cat([obs_robot1 for _ in range(args.num_rollouts // args.num_processes)] + [obs_robot1[:(args.num_rollouts % args.num_processes)]], dim=0))
-            rollouts_robot2.obs[0].copy_(torch.cat([obs_robot2 for _ in range(args.num_rollouts // args.num_processes)] + [obs_robot2[:(args.num_rollouts % args.num_processes)]], dim=0))
+            rollouts_robot1.obs[0].copy_(obs_robot1.repeat(num_obs_tiles, 1)[:args.num_rollouts])
+            rollouts_robot2.obs[0].copy_(obs_robot2.repeat(num_obs_tiles, 1)[:args.num_rollouts])
         else:
             rollouts_robot1.obs[0].copy_(obs_robot1)
             rollouts_robot2.obs[0].copy_(obs_robot2)
@@ -166,10 +172,11 @@ def main():
     else:
         rollouts = RolloutStorage(args.num_steps, args.num_rollouts if args.num_rollouts > 0 else args.num_processes,
                             envs.observation_space.shape, envs.action_space,
-                            actor_critic.recurrent_hidden_state_size)
+                            actor_critic.recurrent_hidden_state_size,
+                            storage_layout=args.storage_layout, dtype=getattr(torch, args.storage_dtype))
         obs = envs.reset()
         if args.num_rollouts > 0:
-            rollouts.obs[0].copy_(torch.cat([obs for _ in range(args.num_rollouts // args.num_processes)] + [obs[:(args.num_rollouts % args.num_processes)]], dim=0))
+            rollouts.obs[0].copy_(obs.repeat(num_obs_tiles, *([1] * (obs.dim() - 1)))[:args.num_rollouts])
         else:
             rollouts.obs[0].copy_(obs)
         rollouts.to(device)
@@ -178,109 +185,141 @@ def main():
     if dual_robots:
         episode_rewards_robot1 = deque(maxlen=deque_len)
         episode_rewards_robot2 = deque(maxlen=deque_len)
+        # Per-process reward histories, cleared in place rather than reallocated
+        reward_list_robot1 = [[] for _ in range(args.num_processes)]
+        reward_list_robot2 = [[] for _ in range(args.num_processes)]
+        eval_reward_list_robot1 = [[] for _ in range(args.num_processes)]
+        eval_reward_list_robot2 = [[] for _ in range(args.num_processes)]
     else:
         episode_rewards = deque(maxlen=deque_len)
 
-    start = time.time()
-    for j in range(num_updates):
-
-        if args.use_linear_lr_decay:
-            # decrease learning rate linearly
-            if args.algo == "acktr":
-                # use optimizer's learning rate since it's hard-coded in kfac.py
-                update_linear_schedule(agent.optimizer, j, num_updates, agent.optimizer.lr)
-            else:
+    def record_episode_rewards(infos):
+        for i, info in enumerate(infos):
+            if dual_robots:
+                reward_list_robot1[i].append(info['reward_robot1'])
+                reward_list_robot2[i].append(info['reward_robot2'])
+            if 'episode' in info.keys():
                 if dual_robots:
-                    update_linear_schedule(agent_robot1.optimizer, j, num_updates, args.lr)
-                    update_linear_schedule(agent_robot2.optimizer, j, num_updates, args.lr)
+                    episode_rewards_robot1.append(np.sum(reward_list_robot1[i]))
+                    episode_rewards_robot2.append(np.sum(reward_list_robot2[i]))
                 else:
-                    update_linear_schedule(agent.optimizer, j, num_updates, args.lr)
+                    episode_rewards.append(info['episode']['r'])
+
+    # Resolve which optimizers and agents get decayed once, rather than branching on args every update
+    decay_optimizers, decay_initial_lrs = [], []
+    if args.use_linear_lr_decay:
+        if args.algo == "acktr":
+            # use optimizer's learning rate since it's hard-coded in kfac.py
+            decay_optimizers, decay_initial_lrs = [agent.optimizer], [agent.optimizer.lr]
+        elif dual_robots:
+            decay_optimizers, decay_initial_lrs = [agent_robot1.optimizer, agent_robot2.optimizer], [args.lr, args.lr]
+        else:
+            decay_optimizers, decay_initial_lrs = [agent.optimizer], [args.lr]
+    clip_decay_agents = []
+    if args.algo == 'ppo' and args.use_linear_clip_decay:
+        clip_decay_agents = [agent_robot1, agent_robot2] if dual_robots else [agent]
 
-        if args.algo == 'ppo' and args.use_linear_clip_decay:
-            if dual_robots:
-                agent_robot1.clip_param = args.clip_param  * (1 - j / float(num_updates))
-                agent_robot2.clip_param = args.clip_param  * (1 - j / float(num_updates))
-            else:
-                agent.clip_param = args.clip_param  * (1 - j / float(num_updates))
+    # The env processes sit idle during the policy update, so let torch use their cores for CPU training
+    update_num_threads = 1 if args.cuda else max(1, (os.cpu_count() or 1) // max(args.num_processes, 1))
 
-        reward_list_robot1 = [[] for _ in range(args.num_processes)]
-        reward_list_robot2 = [[] for _ in range(args.num_processes)]
+    # Created on the first evaluation and reseeded (or recreated) for every later one
+    eval_envs = None
+    eval_vec_norm = None
+    eval_masks = torch.zeros(args.num_processes, 1, device=device)
+
+    # The policies are only updated once every num_rollouts simulations
+    iterations_per_update = args.num_rollouts // args.num_processes if args.num_rollouts > 0 else 1
+
+    start = time.time()
+    for j in range(num_updates):
+
+        if dual_robots:
+            for reward_list in reward_list_robot1 + reward_list_robot2:
+                reward_list.clear()
+        infos = None
         for step in range(args.num_steps):
             # Sample actions
-            with torch.no_grad():
+            with torch.inference_mode():
                 if dual_robots:
-                    value_robot1, action_robot1, action_log_prob_robot1, recurrent_hidden_states_robot1 = actor_critic_robot1.act(
-                            rollouts_robot1.obs[step, :args.num_processes],
+                    value_robot1, action_robot1, action_log_prob_robot1, recurrent_hidden_states_robot1 = act_robot1(
+                            rollouts_robot1.obs[step, :args.num_processes].float(),
                             rollouts_robot1.recurrent_hidden_states[step, :args.num_processes],
                             rollouts_robot1.masks[step, :args.num_processes])
-                    value_robot2, action_robot2, action_log_prob_robot2, recurrent_hidden_states_robot2 = actor_critic_robot2.act(
-                            rollouts_robot2.obs[step, :args.num_processes],
+                    value_robot2, action_robot2, action_log_prob_robot2, recurrent_hidden_states_robot2 = act_robot2(
+                            rollouts_robot2.obs[step, :args.num_processes].float(),
                             rollouts_robot2.recurrent_hidden_states[step, :args.num_processes],
                             rollouts_robot2.masks[step, :args.num_processes])
                 else:
-                    value, action, action_log_prob, recurrent_hidden_states = actor_critic.act(
-                            rollouts.obs[step, :args.num_processes],
+                    value, action, action_log_prob, recurrent_hidden_states = act(
+                            rollouts.obs[step, :args.num_processes].float(),
                             rollouts.recurrent_hidden_states[step, :args.num_processes],
                             rollouts.masks[step, :args.num_processes])
 
             # Obser reward and next obs
             if dual_robots:
                 action = torch.cat((action_robot1, action_robot2), dim=-1)
-                obs, reward, done, infos = envs.step(action)
+            envs.step_async(action)
+            # Record the previous step's episode rewards while the envs simulate this one
+            if infos is not None:
+                record_episode_rewards(infos)
+            obs, reward, done, infos = envs.step_wait()
+            if dual_robots:
                 obs_robot1 = obs[:, :obs_robot_len]
                 obs_robot2 = obs[:, obs_robot_len:]
-                for i, info in enumerate(infos):
-                    reward_list_robot1[i].append(info['reward_robot1'])
-                    reward_list_robot2[i].append(info['reward_robot2'])
                 reward_robot1 = torch.tensor([[info['reward_robot1']] for info in infos])
                 reward_robot2 = torch.tensor([[info['reward_robot2']] for info in infos])
-            else:
-                obs, reward, done, infos = envs.step(action)
-
-            for i, info in enumerate(infos):
-                if 'episode' in info.keys():
-                    if dual_robots:
-                        episode_rewards_robot1.append(np.sum(reward_list_robot1[i]))
-                        episode_rewards_robot2.append(np.sum(reward_list_robot2[i]))
-                    else:
-                        episode_rewards.append(info['episode']['r'])
 
             # If done then clean the history of observations.
-            masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                       for done_ in done])
+            masks = 1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1)
             if dual_robots:
                 rollouts_robot1.insert(obs_robot1, recurrent_hidden_states_robot1, action_robot1, action_log_prob_robot1, value_robot1, reward_robot1, masks)
                 rollouts_robot2.insert(obs_robot2, recurrent_hidden_states_robot2, action_robot2, action_log_prob_robot2, value_robot2, reward_robot2, masks)
             else:
                 rollouts.insert(obs, recurrent_hidden_states, action, action_log_prob, value, reward, masks)
+        record_episode_rewards(infos)
 
-        if args.num_rollouts > 0 and (j % (args.num_rollouts // args.num_processes) != 0):
-            # Only update the policies when we have performed num_rollouts simulations
+        if j % iterations_per_update != 0:
+            # Only update the policies when we have performed num_rollouts simulations.
+            # Everything below (schedules, update, save, log, eval) relies on this update having happened.
             continue
 
-        with torch.no_grad():
+        # decrease learning rate linearly
+        update_linear_schedule_v2(decay_optimizers, j, num_updates, decay_initial_lrs)
+
+        for decay_agent in clip_decay_agents:
+            decay_agent.clip_param = args.clip_param  * (1 - j / float(num_updates))
+
+        with torch.inference_mode():
             if dual_robots:
-                next_value_robot1 = actor_critic_robot1.get_value(rollouts_robot1.obs[-1],
+                next_value_robot1 = actor_critic_robot1.get_value(rollouts_robot1.obs[-1].float(),
                                                     rollouts_robot1.recurrent_hidden_states[-1],
-                                                    rollouts_robot1.masks[-1]).detach()
-                next_value_robot2 = actor_critic_robot2.get_value(rollouts_robot2.obs[-1],
+                                                    rollouts_robot1.masks[-1])
+                next_value_robot2 = actor_critic_robot2.get_value(rollouts_robot2.obs[-1].float(),
                                                     rollouts_robot2.recurrent_hidden_states[-1],
-                                                    rollouts_robot2.masks[-1]).detach()
+                                                    rollouts_robot2.masks[-1])
             else:
-                next_value = actor_critic.get_value(rollouts.obs[-1],
+                next_value = actor_critic.get_value(rollouts.obs[-1].float(),
                                                     rollouts.recurrent_hidden_states[-1],
-                                                    rollouts.masks[-1]).detach()
+                                                    rollouts.masks[-1])
 
         if dual_robots:
             rollouts_robot1.compute_returns(next_value_robot1, args.use_gae, args.gamma, args.tau)
             rollouts_robot2.compute_returns(next_value_robot2, args.use_gae, args.gamma, args.tau)
-            value_loss_robot1, action_loss_robot1, dist_entropy_robot1 = agent_robot1.update(rollouts_robot1)
-            value_loss_robot2, action_loss_robot2, dist_entropy_robot2 = agent_robot2.update(rollouts_robot2)
+            torch.set_num_threads(update_num_threads)
+            try:
+                value_loss_robot1, action_loss_robot1, dist_entropy_robot1 = agent_robot1.update(rollouts_robot1)
+                value_loss_robot2, action_loss_robot2, dist_entropy_robot2 = agent_robot2.update(rollouts_robot2)
+            finally:
+                torch.set_num_threads(1)
             rollouts_robot1.after_update()
             rollouts_robot2.after_update()
         else:
             rollouts.compute_returns(next_value, args.use_gae, args.gamma, args.tau)
-            value_loss, action_loss, dist_entropy = agent.update(rollouts)
+            torch.set_num_threads(update_num_threads)
+            try:
+                value_loss, action_loss, dist_entropy = agent.update(rollouts)
+            finally:
+                torch.set_num_threads(1)
             rollouts.after_update()
 
         # save for every interval-th episode or for the last epoch
@@ -291,21 +330,21 @@ def main():
             except OSError:
                 pass
 
-            # A really ugly way to save a model to CPU
+            # Save CPU copies of the models, the GPU weights are copied straight to the host
             if dual_robots:
                 save_model_robot1 = actor_critic_robot1
                 save_model_robot2 = actor_critic_robot2
                 if args.cuda:
-                    save_model_robot1 = copy.deepcopy(actor_critic_robot1).cpu()
-                    save_model_robot2 = copy.deepcopy(actor_critic_robot2).cpu()
+                    save_model_robot1 = cpu_copy(actor_critic_robot1)
+                    save_model_robot2 = cpu_copy(actor_critic_robot2)
                 save_model = [save_model_robot1, save_model_robot2,
-                              getattr(get_vec_normalize(envs), 'ob_rms', None)]
+                              getattr(train_vec_norm, 'ob_rms', None)]
             else:
                 save_model = actor_critic
                 if args.cuda:
-                    save_model = copy.deepcopy(actor_critic).cpu()
+                    save_model = cpu_copy(actor_critic)
                 save_model = [save_model,
-                              getattr(get_vec_normalize(envs), 'ob_rms', None)]
+                              getattr(train_vec_norm, 'ob_rms', None)]
             torch.save(save_model, os.path.join(save_path, args.env_name + ".pt"))
 
         total_num_steps = (j + 1) * args.num_processes * args.num_steps
@@ -313,45 +352,59 @@ def main():
         if j % args.log_interval == 0 and (len(episode_rewards_robot1) > 1 if dual_robots else len(episode_rewards) > 1):
             end = time.time()
             if dual_robots:
+                # Convert the deques once, then get min/median/max from a single partition
+                rewards_robot1 = np.fromiter(episode_rewards_robot1, dtype=np.float32, count=len(episode_rewards_robot1))
+                rewards_robot2 = np.fromiter(episode_rewards_robot2, dtype=np.float32, count=len(episode_rewards_robot2))
+                min_robot1, median_robot1, max_robot1 = np.percentile(rewards_robot1, [0, 50, 100])
+                min_robot2, median_robot2, max_robot2 = np.percentile(rewards_robot2, [0, 50, 100])
                 print("Robot1 updates {}, num timesteps {}, FPS {} \n Last {} training episodes: mean/median reward {:.1f}/{:.1f}, min/max reward {:.1f}/{:.1f}".
                     format(j, total_num_steps,
                            int(total_num_steps / (end - start)),
                            len(episode_rewards_robot1),
-                           np.mean(episode_rewards_robot1),
-                           np.median(episode_rewards_robot1),
-                           np.min(episode_rewards_robot1),
-                           np.max(episode_rewards_robot1), dist_entropy_robot1,
+                           rewards_robot1.mean(),
+                           median_robot1,
+                           min_robot1,
+                           max_robot1, dist_entropy_robot1,
                            value_loss_robot1, action_loss_robot1))
                 print("Robot2 updates {}, Last {} training episodes: mean/median reward {:.1f}/{:.1f}, min/max reward {:.1f}/{:.1f}\n".
                     format(j, len(episode_rewards_robot2),
-                           np.mean(episode_rewards_robot2),
-                           np.median(episode_rewards_robot2),
-                           np.min(episode_rewards_robot2),
-                           np.max(episode_rewards_robot2), dist_entropy_robot2,
+                           rewards_robot2.mean(),
+                           median_robot2,
+                           min_robot2,
+                           max_robot2, dist_entropy_robot2,
                            value_loss_robot2, action_loss_robot2))
             else:
+                rewards = np.fromiter(episode_rewards, dtype=np.float32, count=len(episode_rewards))
+                min_reward, median_reward, max_reward = np.percentile(rewards, [0, 50, 100])
                 print("Updates {}, num timesteps {}, FPS {} \n Last {} training episodes: mean/median reward {:.1f}/{:.1f}, min/max reward {:.1f}/{:.1f}\n".
                     format(j, total_num_steps,
                            int(total_num_steps / (end - start)),
                            len(episode_rewards),
-                           np.mean(episode_rewards),
-                           np.median(episode_rewards),
-                           np.min(episode_rewards),
-                           np.max(episode_rewards), dist_entropy,
+                           rewards.mean(),
+                           median_reward,
+                           min_reward,
+                           max_reward, dist_entropy,
                            value_loss, action_loss))
             sys.stdout.flush()
 
         if (args.eval_interval is not None
                 and len(episode_rewards) > 1
                 and j % args.eval_interval == 0):
-            eval_envs = make_vec_envs(
-                args.env_name, args.seed + args.num_processes, args.num_processes,
-                args.gamma, eval_log_dir, args.add_timestep, device, True)
-
-            vec_norm = get_vec_normalize(eval_envs)
-            if vec_norm is not None:
-                vec_norm.eval()
-                vec_norm.ob_rms = get_vec_normalize(envs).ob_rms
+            # Every evaluation runs on the same seeds so scores stay comparable across evaluations.
+            # Subprocess envs cannot be reseeded in place, so those are recreated instead.
+            if eval_envs is not None and not seed_vec_env(eval_envs, args.seed + args.num_processes):
+                eval_envs.close()
+                eval_envs = None
+            if eval_envs is None:
+                eval_envs = make_vec_envs(
+                    args.env_name, args.seed + args.num_processes, args.num_processes,
+                    args.gamma, eval_log_dir, args.add_timestep, device, True)
+                eval_vec_norm = get_vec_normalize(eval_envs)
+                if eval_vec_norm is not None:
+                    eval_vec_norm.eval()
+
+            if eval_vec_norm is not None and train_vec_norm is not None:
+                eval_vec_norm.ob_rms = train_vec_norm.ob_rms
 
             if dual_robots:
                 eval_episode_rewards_robot1 = []
@@ -370,12 +423,13 @@ def main():
             else:
                 eval_recurrent_hidden_states = torch.zeros(args.num_processes,
                                 actor_critic.recurrent_hidden_state_size, device=device)
-            eval_masks = torch.zeros(args.num_processes, 1, device=device)
+            eval_masks.zero_()
 
-            eval_reward_list_robot1 = [[] for _ in range(args.num_processes)]
-            eval_reward_list_robot2 = [[] for _ in range(args.num_processes)]
+            if dual_robots:
+                for reward_list in eval_reward_list_robot1 + eval_reward_list_robot2:
+                    reward_list.clear()
             while (len(eval_episode_rewards_robot1) < 10 if dual_robots else len(eval_episode_rewards) < 10):
-                with torch.no_grad():
+                with torch.inference_mode():
                     if dual_robots:
                         _, action_robot1, _, eval_recurrent_hidden_states_robot1 = actor_critic_robot1.act(
                             obs_robot1, eval_recurrent_hidden_states_robot1, eval_masks, deterministic=True)
@@ -397,8 +451,7 @@ def main():
                 else:
                     obs, reward, done, infos = eval_envs.step(action)
 
-                eval_masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                                for done_ in done])
+                eval_masks.copy_(1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1))
                 reset_rewards = False
                 for info in infos:
                     if 'episode' in info.keys():
@@ -409,10 +462,8 @@ def main():
                         else:
                             eval_episode_rewards.append(info['episode']['r'])
                 if reset_rewards:
-                    eval_reward_list_robot1 = [[] for _ in range(args.num_processes)]
-                    eval_reward_list_robot2 = [[] for _ in range(args.num_processes)]
-
-            eval_envs.close()
+                    for reward_list in eval_reward_list_robot1 + eval_reward_list_robot2:
+                        reward_list.clear()
 
             if dual_robots:
                 print(" Evaluation using {} episodes: robot1 mean reward {:.5f}, robot2 mean reward {:.5f}\n".
@@ -432,6 +483,9 @@ def main():
             except IOError:
                 pass
 
+    if eval_envs is not None:
+        eval_envs.close()
+
 
 if __name__ == "__main__":
     import argparse
@@ -190,8 +190,7 @@ def main():
                     episode_rewards.append(info['episode']['r'])
 
             # If done then clean the history of observations.
-            masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                       for done_ in done])
+            masks = 1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1)
             rollouts_robot.insert(obs_robot, recurrent_hidden_states_robot, action_robot, action_log_prob_robot, value_robot, reward, masks)
             rollouts_human.insert(obs_human, recurrent_hidden_states_human, action_human, action_log_prob_human, value_human, reward, masks)
 
@@ -287,8 +286,7 @@ def main():
                 obs_robot = obs[:, :obs_robot_len]
                 obs_human = obs[:, obs_robot_len:]
 
-                eval_masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                                for done_ in done])
+                eval_masks = 1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1)
                 for info in infos:
                     if 'episode' in info.keys():
                         eval_episode_rewards.append(info['episode']['r'])
@@ -153,8 +153,7 @@ def main():
                     episode_rewards.append(info['episode']['r'])
 
             # If done then clean the history of observations.
-            masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                       for done_ in done])
+            masks = 1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1)
             rollouts.insert(obs, recurrent_hidden_states, action, action_log_prob, value, reward, masks)
 
         if args.num_rollouts > 0 and (j % (args.num_rollouts // args.num_processes) != 0):
@@ -225,8 +224,7 @@ def main():
                 # Obser reward and next obs
                 obs, reward, done, infos = eval_envs.step(action)
 
-                eval_masks = torch.FloatTensor([[0.0] if done_ else [1.0]
-                                                for done_ in done])
+                eval_masks = 1.0 - torch.as_tensor(done, dtype=torch.float32, device=device).unsqueeze(1)
                 reset_rewards = False
                 for info in infos:
                     if 'episode' in info.keys():